@@ -1,8 +1,13 @@
 import streamlit as st
+import hashlib
+import io
 import os
+import shutil
+import subprocess
 import tempfile
-import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, Optional
 
 # --- Gemini SDK Imports ---
@@ -14,121 +19,549 @@ except ImportError:
     st.error("The 'google-genai' library is not installed. Please install it using 'pip install google-genai'.")
     st.stop()
 
+try:
+    import diskcache
+except ImportError:
+    # Optional: without it results are only cached in process memory
+    diskcache = None
+
+def _is_transient_api_error(exc: BaseException) -> bool:
+    """Rate limits and server-side errors are worth retrying; permanent
+    client errors (bad argument, not found, ...) should fail fast."""
+    return (isinstance(exc, GeminiAPIError)
+            and getattr(exc, 'code', None) in {429, 500, 502, 503, 504})
+
+try:
+    from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+    _retry_transient = retry(
+        retry=retry_if_exception(_is_transient_api_error),
+        wait=wait_exponential(max=30),
+        stop=stop_after_attempt(5),
+        reraise=True,
+    )
+except ImportError:
+    # Optional: without it transient API errors fail on the first attempt
+    def _retry_transient(func):
+        return func
+
 
 # --- Configuration and Client Initialization ---
 # ❗ IMPORTANT: Ensure GEMINI_API_KEY is set in Streamlit secrets
+
+@st.cache_resource
+def get_client():
+    """
+    Builds the Gemini client exactly once per worker process and shares it
+    across sessions/reruns, so TLS/auth setup and the underlying HTTP
+    connection pool are reused instead of being rebuilt on every script run.
+    """
+    return genai.Client(api_key=st.secrets["GEMINI_API_KEY"])
+
+@st.cache_resource
+def get_disk_cache():
+    """
+    Disk-backed result cache keyed by content hash, shared by all sessions.
+    Unlike st.cache_data it survives worker restarts (and can be shared
+    across replicas via a shared volume), so a cold start doesn't force
+    re-inference. Entries hold only the result text, a few KB each.
+    Returns None when diskcache is not installed.
+    """
+    if diskcache is None:
+        return None
+    return diskcache.Cache('/tmp/av-summarizer-cache', size_limit=2 * 1024**3)
+
 try:
-    # Attempt to retrieve API Key from Streamlit secrets
-    API_KEY = st.secrets["GEMINI_API_KEY"] 
+    # Warm the client at import so the first user request doesn't pay auth latency
+    client = get_client()
 except KeyError:
     st.error("🚨 API Key Error: Please set 'GEMINI_API_KEY' in your Streamlit secrets file or Streamlit Cloud Secrets.")
     st.stop()
-
-try:
-    # Initialize the Gemini Client globally
-    client = genai.Client(api_key=API_KEY)  
 except Exception as e:
     st.error(f"Error initializing AI client. Details: {e}")
     st.stop()
-    
+
 # Model name used for transcription and summarization
 # --- CHANGE: Using the faster/free tier model ---
-MODEL_NAME = "gemini-2.5-flash" 
+MODEL_NAME = "gemini-2.5-flash"
+
+# How many uploaded Gemini File handles to keep per session before evicting
+# the oldest; the File API expires handles after 48 h regardless.
+_MAX_SESSION_FILES = 8
+
+# Shared pool for fire-and-forget File API deletions, so cleanup RTTs
+# (~200-500 ms each) never block rendering or the next interaction.
+_cleanup_pool = ThreadPoolExecutor(max_workers=2)
+
+# Process-wide cap on in-flight Gemini calls, so multi-user load queues
+# here instead of tripping the API's 429 rate limiting.
+_GEMINI_SEM = threading.BoundedSemaphore(3)
+
+# Media longer than this is split into _SEGMENT_SECS pieces that are
+# transcribed in parallel, followed by one cheap text-only summary call.
+# Files below the size floor are never probed - they can't be that long.
+_SEGMENT_MIN_DURATION_SECS = 1800
+_SEGMENT_SECS = 300
+_SEGMENT_MIN_SIZE = 20 * 1024 * 1024
+
+# --- Prompts ---
+# The prompts and generation config are constant, so they are built once at
+# import rather than on every analysis call.
+
+_SYSTEM_INSTRUCTION = (
+    "You are a professional audio/video summarizer. Your task is two-fold: "
+    "1. First, create a complete, accurate, and detailed **TRANSCRIPT** of the entire audio content. "
+    "2. Second, analyze the transcript and extract the 5 most critical learning points, concepts, or steps discussed, and present them as a bulleted **SUMMARY**. "
+    "You MUST output the result in the following structured format, and use the detected language of the media for the SUMMARY (Burmese, English, etc.):"
+)
+
+_SECTION_FORMAT = (
+    "## 📝 Full Transcript\n"
+    "[The complete, verbatim transcription text here]\n\n"
+    "## ✅ Key Point Summary (5 Points)\n"
+    "[The 5 key points in bullet-point format, using the primary language of the speech in the audio/video]"
+)
+
+_USER_QUERY_SINGLE = (
+    "Please analyze the provided file. First, generate the full transcript. "
+    "Second, provide a concise summary (5 key points). "
+    "Format the output strictly as:\n" + _SECTION_FORMAT
+)
+
+_USER_QUERY_MULTI = (
+    "Please analyze each of the provided files in order. For every file, "
+    "first generate the full transcript, then provide a concise summary (5 key points). "
+    "Begin each file's section with a '## FILE: <file display name>' heading, "
+    "then format the section strictly as:\n" + _SECTION_FORMAT
+)
+
+_USER_QUERY_TRANSCRIBE = (
+    "Please transcribe the provided media segment completely and verbatim, "
+    "in the primary language of the speech. Output only the transcription text."
+)
+
+_USER_QUERY_SUMMARIZE = (
+    "The following is the full transcript of an audio/video recording. "
+    "Extract the 5 most critical learning points, concepts, or steps discussed "
+    "and present them as bullet points, using the primary language of the "
+    "transcript. Output only the 5 bullet points.\n\nTranscript:\n"
+)
+
+_GEN_CONFIG = types.GenerateContentConfig(
+    system_instruction=_SYSTEM_INSTRUCTION,
+    temperature=0.0 # Keep analysis factual
+)
+
+# For the segment-transcribe and merge-summarize calls, whose prompts ask
+# for bare text - the summarizer system instruction would reimpose the
+# two-part structured format on every piece.
+_PLAIN_GEN_CONFIG = types.GenerateContentConfig(
+    temperature=0.0
+)
 
 
 # --- Utility Function: Core Logic ---
 
-def analyze_media_with_gemini(uploaded_file, mime_type: str) -> Tuple[Optional[str], str]:
+@_retry_transient
+def _upload_file(file_obj, mime_type: str, display_name: str):
+    """Uploads the in-memory file object to the Gemini File API (blocking SDK call)."""
+    # The SDK accepts file-like objects, so the upload goes straight from the
+    # UploadedFile buffer - no intermediate copy on disk. The buffer carries
+    # no name/type, so both are passed explicitly.
+    with _GEMINI_SEM:
+        file_obj.seek(0)
+        return client.files.upload(
+            file=file_obj,
+            config={'mime_type': mime_type, 'display_name': display_name}
+        )
+
+
+@_retry_transient
+def _generate_analysis(gemini_files) -> str:
     """
-    1. Uploads the audio/video file to the Gemini File API.
-    2. Sends the file to the chosen Gemini model for transcription and summarization.
-    3. Deletes the file from the File API after use.
-    
-    Returns: (analysis_result_text, detected_language_code)
+    Streams the transcription + summarization model call, rendering tokens
+    into the UI as they arrive, and returns the full concatenated text.
+    Accepts one or more Gemini File parts; all files share a single model
+    call so the system instruction is prefilled once for the whole batch.
+    A call that fails mid-stream is retried from the start with a fresh
+    stream element.
     """
-    
-    st.info(f"Step 1/2: Uploading file **{uploaded_file.name}**")
-    
-    uploaded_file.seek(0)
-    temp_path = None
-    
-    try:
-        # Create a temporary file on disk for the SDK to upload
-        file_suffix = os.path.splitext(uploaded_file.name)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_suffix) as tmp_file:
-            tmp_file.write(uploaded_file.read())
-            temp_path = tmp_file.name
-        
-        # 1. Upload the file to the Gemini File API
-        # FIX APPLIED: Removed 'mime_type' keyword argument. The SDK handles detection.
-        gemini_file = client.files.upload(file=temp_path)
-        st.success(f"File uploaded successfully.")
-
-        # --- Dynamic Prompts ---
-        system_instruction = (
-            "You are a professional audio/video summarizer. Your task is two-fold: "
-            "1. First, create a complete, accurate, and detailed **TRANSCRIPT** of the entire audio content. "
-            "2. Second, analyze the transcript and extract the 5 most critical learning points, concepts, or steps discussed, and present them as a bulleted **SUMMARY**. "
-            "You MUST output the result in the following structured format, and use the detected language of the media for the SUMMARY (Burmese, English, etc.):"
+
+    user_query = _USER_QUERY_MULTI if len(gemini_files) > 1 else _USER_QUERY_SINGLE
+
+    # The semaphore is held for the whole stream so a decode in flight
+    # counts against the concurrency cap, and released between retries.
+    with _GEMINI_SEM:
+        stream = client.models.generate_content_stream(
+            model=MODEL_NAME, # Using gemini-2.5-flash
+            contents=[user_query] + list(gemini_files), # Prompt plus all file parts
+            config=_GEN_CONFIG
         )
-        
-        user_query = (
-            "Please analyze the provided file. First, generate the full transcript. "
-            "Second, provide a concise summary (5 key points). "
-            "Format the output strictly as:\n"
-            "## 📝 Full Transcript\n"
-            "[The complete, verbatim transcription text here]\n\n"
-            "## ✅ Key Point Summary (5 Points)\n"
-            "[The 5 key points in bullet-point format, using the primary language of the speech in the audio/video]"
+
+        # Collect the chunks while st.write_stream paints them, so the first
+        # tokens appear in ~1 s instead of after the full response is decoded.
+        collected = []
+
+        def tokens():
+            for event in stream:
+                text = event.text or ''
+                collected.append(text)
+                yield text
+
+        st.write_stream(tokens())
+        return ''.join(collected)
+
+
+def _get_or_reuse_uploads(file_hashes, uploaded_files, mime_types, executor):
+    """
+    Resolves each media file to an ACTIVE Gemini File, reusing server-side
+    handles from previous runs when still live and uploading the rest
+    concurrently, so re-clicking Generate on the same media doesn't
+    re-upload 50 MB and multi-file batches overlap their uploads.
+    """
+    session_files = st.session_state.setdefault('gemini_files', {})
+    resolved = [None] * len(uploaded_files)
+    pending = []
+
+    for i, (file_hash, uploaded_file, mime_type) in enumerate(
+            zip(file_hashes, uploaded_files, mime_types)):
+        existing_name = session_files.get(file_hash)
+        if existing_name:
+            try:
+                existing = client.files.get(name=existing_name)
+                if getattr(existing.state, 'name', existing.state) == 'ACTIVE':
+                    # Re-insert so the dict stays ordered least-recently-used first
+                    session_files[file_hash] = session_files.pop(file_hash)
+                    st.info(f"Reusing previously uploaded **{uploaded_file.name}** (still active on the File API).")
+                    resolved[i] = existing
+                    continue
+            except Exception:
+                pass  # Handle expired or was deleted server-side; fall through
+            session_files.pop(file_hash, None)
+
+        pending.append((i, file_hash, executor.submit(
+            _upload_file, uploaded_file, mime_type, uploaded_file.name)))
+
+    for i, file_hash, future in pending:
+        gemini_file = future.result()
+        resolved[i] = gemini_file
+        session_files[file_hash] = gemini_file.name
+
+    # Evict the oldest handles beyond the cap instead of deleting after
+    # every call; only evicted entries are removed from the File API. The
+    # deletes are fire-and-forget - a failure just leaves the handle to the
+    # API's own 48 h expiry.
+    while len(session_files) > _MAX_SESSION_FILES:
+        stale_hash = next(iter(session_files))
+        stale_name = session_files.pop(stale_hash)
+        _cleanup_pool.submit(client.files.delete, name=stale_name)
+
+    return resolved
+
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def _analyze_cached(batch_hash: str, _uploaded_files, _mime_types, audio_only: bool) -> str:
+    """
+    Content-addressable analysis pipeline, cached by the combined hash of
+    all media in the batch.
+
+    1. Uploads the media to the Gemini File API straight from memory,
+       reusing still-active server-side handles where they exist and
+       overlapping the remaining uploads.
+    2. Sends all files in a single model call for transcription and
+       summarization, amortizing the prompt prefill across the batch.
+
+    The leading underscores exclude the file objects and MIME types from
+    the cache key, so identical media bytes (same batch_hash) return the
+    stored result text instantly, skipping the uploads and model call
+    entirely. Only the result text is cached - never the Gemini file
+    handles, since those expire server-side. Raises on failure so errors
+    are never stored in the cache.
+    """
+
+    # Check the persistent disk tier first - a hit here turns re-inference
+    # after a worker restart into a ~10 ms read. The key carries the
+    # audio_only flag, like the in-memory tier's, so toggling it never
+    # serves the other variant's result.
+    disk_cache = get_disk_cache()
+    disk_key = f"{batch_hash}:{audio_only}"
+    if disk_cache is not None:
+        try:
+            cached_text = disk_cache.get(disk_key)
+        except Exception:
+            # The disk tier is best-effort: a broken store (cleaned-up /tmp,
+            # corrupt sqlite, ...) degrades to a miss, never a failed run
+            cached_text = None
+        if cached_text is not None:
+            st.success("Result restored from the persistent cache.")
+            return cached_text
+
+    file_hashes = batch_hash.split('-')
+
+    # Run the blocking SDK calls on worker threads so the Streamlit
+    # script thread stays free to paint progress sub-steps.
+    with st.status("Processing media...", expanded=True) as status, \
+            ThreadPoolExecutor(max_workers=4) as executor:
+
+        start_time = time.perf_counter()
+        result_text = None
+
+        # Optionally strip video uploads down to their audio track before
+        # anything touches the network - the model only listens anyway.
+        if audio_only and _ffmpeg_available():
+            for i, mime_type in enumerate(_mime_types):
+                if not mime_type.startswith('video/'):
+                    continue
+                status.update(label=f"Extracting audio from {_uploaded_files[i].name}...")
+                audio_file = _transcode_to_audio(_uploaded_files[i])
+                if audio_file is not None:
+                    st.info(
+                        f"Extracted audio from **{_uploaded_files[i].name}**: "
+                        f"{_uploaded_files[i].size / 1e6:.1f} MB → {audio_file.size / 1e6:.1f} MB."
+                    )
+                    _uploaded_files[i] = audio_file
+                    _mime_types[i] = audio_file.type
+                    # Keep the session handle for the audio variant distinct
+                    # from one uploaded for the full video
+                    file_hashes[i] = file_hashes[i] + ':audio'
+
+        # A single long file takes the segment-and-merge path when ffmpeg is
+        # available; everything else falls through to the single-shot call.
+        if (len(_uploaded_files) == 1
+                and _uploaded_files[0].size > _SEGMENT_MIN_SIZE
+                and _ffmpeg_available()):
+            result_text = _analyze_long_media(_uploaded_files[0], _mime_types[0], executor, status)
+
+        if result_text is None:
+            # 1. Upload the files to the Gemini File API (or reuse live handles)
+            status.update(label="Uploading to the Gemini File API...")
+            gemini_files = _get_or_reuse_uploads(file_hashes, _uploaded_files, _mime_types, executor)
+            st.success(f"File upload{'s' if len(gemini_files) > 1 else ''} completed successfully.")
+
+            # 2. Call Gemini for Transcription and Summarization
+            status.update(label="Analyzing with the AI model...")
+            st.info(f"Step 2/2: Sending file{'s' if len(gemini_files) > 1 else ''} to AI model for analysis...")
+
+            # Streaming must render from the script thread, so this call is
+            # not offloaded; the per-chunk iteration keeps the UI live.
+            result_text = _generate_analysis(gemini_files)
+
+        end_time = time.perf_counter()
+        st.success(f"Analysis completed in {end_time - start_time:.2f} seconds.")
+        # Collapse the status box: the caller renders the final text below,
+        # and this also hides any partial stream left by a mid-stream retry.
+        status.update(label="Analysis complete", state="complete", expanded=False)
+
+    if disk_cache is not None:
+        try:
+            disk_cache.set(disk_key, result_text, expire=7 * 24 * 3600)
+        except Exception:
+            # A failed write (disk full, store gone) must not throw away a
+            # completed inference result - skip persisting and carry on
+            pass
+
+    return result_text
+
+
+class _AudioBuffer(io.BytesIO):
+    """In-memory stand-in for an UploadedFile, holding an extracted audio track."""
+
+    def __init__(self, data: bytes, name: str):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+        self.type = 'audio/ogg'
+
+
+def _transcode_to_audio(uploaded_file) -> Optional[_AudioBuffer]:
+    """
+    Extracts the audio track from a video upload as 32 kbps mono Opus at
+    16 kHz - well within the ASR sweet spot and typically 5-20x smaller
+    than the source video, shrinking both upload time and quota use.
+    Returns None when ffmpeg can't process the file.
+    """
+    suffix = os.path.splitext(uploaded_file.name)[1] or '.bin'
+
+    with tempfile.TemporaryDirectory() as workdir:
+        src_path = os.path.join(workdir, 'source' + suffix)
+        uploaded_file.seek(0)
+        with open(src_path, 'wb') as dst:
+            shutil.copyfileobj(uploaded_file, dst, length=1024 * 1024)
+
+        out_path = os.path.join(workdir, 'audio.ogg')
+        try:
+            subprocess.run(
+                ['ffmpeg', '-y', '-v', 'error', '-i', src_path, '-vn',
+                 '-acodec', 'libopus', '-b:a', '32k', '-ac', '1', '-ar', '16000',
+                 out_path],
+                check=True, capture_output=True, timeout=600)
+        except subprocess.SubprocessError:
+            return None
+
+        with open(out_path, 'rb') as out:
+            data = out.read()
+
+    return _AudioBuffer(data, os.path.splitext(uploaded_file.name)[0] + '.ogg')
+
+
+def _ffmpeg_available() -> bool:
+    """True when both ffmpeg and ffprobe are on PATH."""
+    return shutil.which('ffmpeg') is not None and shutil.which('ffprobe') is not None
+
+
+def _media_duration_secs(path: str) -> Optional[float]:
+    """Returns the media duration via ffprobe, or None if it can't be read."""
+    try:
+        probe = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', path],
+            capture_output=True, text=True, timeout=60)
+        return float(probe.stdout.strip())
+    except (subprocess.SubprocessError, ValueError):
+        return None
+
+
+def _split_media(src_path: str, workdir: str, suffix: str):
+    """
+    Splits the media into ~_SEGMENT_SECS pieces with a stream copy (no
+    re-encode). Returns None when ffmpeg can't copy-split the container,
+    so the caller falls back to the single-shot path.
+    """
+    out_pattern = os.path.join(workdir, 'segment_%03d' + suffix)
+    try:
+        subprocess.run(
+            ['ffmpeg', '-y', '-v', 'error', '-i', src_path, '-f', 'segment',
+             '-segment_time', str(_SEGMENT_SECS), '-c', 'copy', out_pattern],
+            check=True, capture_output=True, timeout=600)
+    except subprocess.SubprocessError:
+        return None
+    return sorted(
+        os.path.join(workdir, name) for name in os.listdir(workdir)
+        if name.startswith('segment_')
+    )
+
+
+@_retry_transient
+def _transcribe_file(gemini_file) -> str:
+    """Transcript-only model call for one media segment (blocking SDK call)."""
+    with _GEMINI_SEM:
+        response = client.models.generate_content(
+            model=MODEL_NAME,
+            contents=[_USER_QUERY_TRANSCRIBE, gemini_file],
+            config=_PLAIN_GEN_CONFIG
         )
+        return response.text or ''
+
 
-        # 2. Call Gemini for Transcription and Summarization
-        st.info(f"Step 2/2: Sending file to AI model for analysis...")
-        start_time = time.time()
-        
+@_retry_transient
+def _summarize_transcript(transcript: str) -> str:
+    """Text-only summary call over the merged transcript - much cheaper than
+    re-sending the media."""
+    with _GEMINI_SEM:
         response = client.models.generate_content(
-            model=MODEL_NAME, # Using gemini-2.5-flash
-            contents=[user_query, gemini_file], # Pass both the prompt and the file part
-            config=types.GenerateContentConfig( 
-                system_instruction=system_instruction,
-                temperature=0.0 # Keep analysis factual
-            )
+            model=MODEL_NAME,
+            contents=[_USER_QUERY_SUMMARIZE + transcript],
+            config=_PLAIN_GEN_CONFIG
         )
-        
-        end_time = time.time()
-        st.success(f"Analysis completed in {end_time - start_time:.2f} seconds.")
-        
-        return response.text, "Unknown"
-            
-    except GeminiAPIError as e: 
+        return response.text or ''
+
+
+def _analyze_long_media(uploaded_file, mime_type: str, executor, status) -> Optional[str]:
+    """
+    Splits long media into ~5-minute segments with ffmpeg, transcribes the
+    segments concurrently, then issues one text-only call for the summary,
+    so a 90-minute recording is bounded by the slowest segment plus a cheap
+    merge call rather than one monolithic decode.
+
+    Returns None when the media turns out to be short enough (or indivisible),
+    in which case the caller falls back to the single-shot path.
+    """
+    suffix = os.path.splitext(uploaded_file.name)[1] or '.bin'
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # ffmpeg needs the media on disk; copy it over in bounded chunks
+        src_path = os.path.join(workdir, 'source' + suffix)
+        uploaded_file.seek(0)
+        with open(src_path, 'wb') as dst:
+            shutil.copyfileobj(uploaded_file, dst, length=1024 * 1024)
+
+        duration = _media_duration_secs(src_path)
+        if not duration or duration <= _SEGMENT_MIN_DURATION_SECS:
+            return None
+
+        status.update(label="Splitting long media into segments...")
+        seg_paths = _split_media(src_path, workdir, suffix)
+        if seg_paths is None or len(seg_paths) < 2:
+            return None
+        st.info(f"Long media detected ({duration / 60:.0f} min): transcribing {len(seg_paths)} segments in parallel.")
+
+        status.update(label=f"Transcribing {len(seg_paths)} segments...")
+
+        def upload_and_transcribe(seg_path):
+            with open(seg_path, 'rb') as seg:
+                gemini_file = _upload_file(seg, mime_type, os.path.basename(seg_path))
+            try:
+                return _transcribe_file(gemini_file)
+            finally:
+                # Segment handles are garbage once transcribed - delete them
+                # fire-and-forget instead of leaking them until the 48 h TTL
+                _cleanup_pool.submit(client.files.delete, name=gemini_file.name)
+
+        transcripts = list(executor.map(upload_and_transcribe, seg_paths))
+
+    status.update(label="Summarizing the combined transcript...")
+    transcript = '\n\n'.join(t.strip() for t in transcripts if t.strip())
+    summary = _summarize_transcript(transcript)
+
+    return (
+        "## 📝 Full Transcript\n" + transcript + "\n\n"
+        "## ✅ Key Point Summary (5 Points)\n" + summary
+    )
+
+
+def _hash_file(uploaded_file) -> str:
+    """Hashes the media in 1 MiB chunks so peak memory stays bounded."""
+    uploaded_file.seek(0)
+    hasher = hashlib.blake2b(digest_size=16)
+    for chunk in iter(lambda: uploaded_file.read(1024 * 1024), b''):
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def analyze_media_with_gemini(uploaded_files, mime_types, audio_only: bool = True) -> Tuple[Optional[str], str]:
+    """
+    Hashes each uploaded media file, then delegates the whole batch to the
+    cached analysis pipeline, so resubmitting identical media returns the
+    stored result instantly.
+
+    Returns: (analysis_result_text, detected_language_code)
+    """
+
+    names = ', '.join(f"**{f.name}**" for f in uploaded_files)
+    st.info(f"Step 1/2: Uploading {names}")
+
+    # One hash per file; joined they key the batch cache and, split apart
+    # again inside the pipeline, the per-file session handle reuse.
+    batch_hash = '-'.join(_hash_file(f) for f in uploaded_files)
+
+    try:
+        return _analyze_cached(batch_hash, list(uploaded_files), list(mime_types), audio_only), "Unknown"
+    except GeminiAPIError as e:
         st.error(f"API Call Failed: {e}")
         return "Analysis failed due to API connection error.", ""
     except Exception as e:
         # This will now catch other errors, including if the API returns an error on file upload
         st.error(f"An unexpected error occurred: {e}")
         return "Analysis failed due to an unexpected error.", ""
-    finally:
-        # 3. Clean up: Delete the file from the Gemini File API
-        if 'gemini_file' in locals():
-            st.info(f"Cleaning up: Deleting file from API: {gemini_file.name}")
-            try:
-                client.files.delete(name=gemini_file.name)
-            except Exception as e:
-                st.warning(f"Could not delete uploaded file. Please check the files dashboard if necessary. Error: {e}")
-
-        # Clean up the temporary local file
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
 
 
 # --- Streamlit UI ---
 st.set_page_config(page_title="Video/Audio Summarizer)", layout="centered")
 
-st.markdown("""
+_CSS = """
 <style>
     /* Custom Styling for aesthetics */
     .stButton>button {
-        background-color: #0A66C2; 
+        background-color: #0A66C2;
         color: white;
         font-size: 16px;
         padding: 10px 24px;
@@ -140,14 +573,22 @@ st.markdown("""
         background-color: #004182;
     }
     .main-header {
-        color: #0A66C2; 
+        color: #0A66C2;
         font-weight: bold;
         text-align: center;
         padding-bottom: 10px;
         border-bottom: 2px solid #e0e0e0;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+@st.cache_data
+def _inject_css():
+    """Emits the static CSS from the cache replay path, so reruns reuse the
+    recorded element instead of re-rendering the markdown block."""
+    st.markdown(_CSS, unsafe_allow_html=True)
+
+_inject_css()
 
 
 st.markdown(f'<h1 class="main-header">🎙️Video/Audio Summarizer</h1>', unsafe_allow_html=True)
@@ -158,46 +599,68 @@ st.write("Upload **any** video or audio file (e.g., MP3, MP4, WAV) up to **50MB*
 # File Uploader
 # File types for the Streamlit file uploader (extensions)
 ALL_MEDIA_EXTENSIONS = [
-    "mp4", "mov", "wav", "mp3", "m4a", "mkv", "avi", "flv", "wmv", 
+    "mp4", "mov", "wav", "mp3", "m4a", "mkv", "avi", "flv", "wmv",
     "ogg", "flac", "webm"
 ]
 
-uploaded_file = st.file_uploader(
-    "Upload Video or Audio File",
-    type=ALL_MEDIA_EXTENSIONS,
-    accept_multiple_files=False
-)
+# Extension -> MIME fallback for when Streamlit's detection is generic
+_EXT_TO_MIME = {
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+    'mp4': 'video/mp4',
+    'mov': 'video/quicktime',
+    'm4a': 'audio/m4a',
+    'ogg': 'audio/ogg',
+    'flac': 'audio/flac',
+    'webm': 'video/webm',
+    'mkv': 'video/x-matroska',
+    'avi': 'video/x-msvideo',
+    'flv': 'video/x-flv',
+    'wmv': 'video/x-ms-wmv',
+}
+
+# The form batches every widget change into a single rerun on submit, so
+# picking files doesn't trigger full script reruns before Generate is clicked.
+with st.form("upload_form", clear_on_submit=False):
+    uploaded_files = st.file_uploader(
+        "Upload Video or Audio Files",
+        type=ALL_MEDIA_EXTENSIONS,
+        accept_multiple_files=True
+    )
+    audio_only = st.checkbox("Audio-only (faster, uses less quota)", value=True)
+    submitted = st.form_submit_button("Generate Transcript and Summary")
+
+if submitted and not uploaded_files:
+    st.warning("Please upload at least one video or audio file first.")
+
+if submitted and uploaded_files:
+    # Reject oversized files up front (Gemini File API limit), before any
+    # further rendering or processing; config.toml's maxUploadSize already
+    # blocks most of these at the HTTP layer.
+    oversized = [f.name for f in uploaded_files if f.size > (50 * 1024 * 1024)]
+    if oversized:
+        st.error(f"File size limit exceeded for: {', '.join(oversized)}. Please upload files smaller than 50MB for reliable processing via the File API.")
+        st.stop()
+
+    mime_types = []
+    for uploaded_file in uploaded_files:
+        # Determine MIME type, falling back to the extension table when
+        # Streamlit's detection is generic
+        mime_type = uploaded_file.type
+        if not mime_type or 'octet-stream' in mime_type:
+            ext = os.path.splitext(uploaded_file.name)[1].lower().replace('.', '')
+            mime_type = _EXT_TO_MIME.get(ext, 'application/octet-stream')
+
+        mime_types.append(mime_type)
+        st.success(f"File uploaded: **{uploaded_file.name}** (Detected MIME: `{mime_type}`) - Ready to process.")
+
+    # Main processing function call - all files share one model call
+    with st.spinner(f"Processing with Model..."):
+        analysis_result, _ = analyze_media_with_gemini(uploaded_files, mime_types, audio_only)
 
-if uploaded_file is not None:
-    # Determine MIME type 
-    mime_type = uploaded_file.type 
-    
-    # Fallback to determine MIME type from extension if Streamlit's detection is generic
-    if not mime_type or 'octet-stream' in mime_type:
-        ext = os.path.splitext(uploaded_file.name)[1].lower().replace('.', '')
-        if ext == 'mp3': mime_type = 'audio/mpeg'
-        elif ext == 'wav': mime_type = 'audio/wav'
-        elif ext == 'mp4': mime_type = 'video/mp4'
-        elif ext == 'mov': mime_type = 'video/quicktime'
-        elif ext == 'm4a': mime_type = 'audio/m4a'
-        elif ext == 'ogg': mime_type = 'audio/ogg'
-        else: mime_type = 'application/octet-stream' # Default fallback
-        
-    st.success(f"File uploaded: **{uploaded_file.name}** (Detected MIME: `{mime_type}`) - Ready to process.")
-    
-    if st.button("Generate Transcript and Summary"):
-        
-        # Check size limit (Gemini File API limit)
-        if uploaded_file.size > (50 * 1024 * 1024): 
-            st.error("File size limit exceeded. Please upload a file smaller than 50MB for reliable processing via the File API.")
-        else:
-            # Main processing function call
-            with st.spinner(f"Processing with Model..."):
-                analysis_result, _ = analyze_media_with_gemini(uploaded_file, mime_type)
-            
-            # Display the result (which is already formatted with Markdown headings)
-            if analysis_result and not analysis_result.startswith("Analysis failed"):
-                st.markdown(analysis_result)
-                st.success(f"Process complete: Transcription and Summary extracted by {MODEL_NAME}.")
-            else:
-                st.error("The analysis failed. Please check the error messages above for details.")
+    # Display the result (which is already formatted with Markdown headings)
+    if analysis_result and not analysis_result.startswith("Analysis failed"):
+        st.markdown(analysis_result)
+        st.success(f"Process complete: Transcription and Summary extracted by {MODEL_NAME}.")
+    else:
+        st.error("The analysis failed. Please check the error messages above for details.")